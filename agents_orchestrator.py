@@ -8,6 +8,12 @@ import subprocess
 import argparse
 from typing import Dict, List
 
+from tracer import TRACER
+from context_memory import ContextMemory, clip_tokens
+from citation_index import CitationIndex, BibliographyWriter, safe_id
+from model_router import ModelRouter, LOCAL_MODEL
+from architect_state import ArchitectState, corpus_fingerprint, parse_synthesis_matrix
+
 try:
     from paper_fetcher import ResearchEngine
 except ImportError as e:
@@ -132,11 +138,17 @@ class TokenCounter:
 class CitationAuditor:
     """Phase 1.3: Citation Shield Enforcement."""
     @classmethod
-    def audit(cls, text: str, matrix_refs: int = 0) -> List[str]:
+    def audit(cls, text: str, matrix_refs: int = 0, index: CitationIndex = None) -> List[str]:
         issues = []
         citations = re.findall(r'\[\d+\]', text)
         unique_citations = set(citations)
         
+        # Local check against the research catalog: no LLM call needed to catch hallucinated refs
+        if index is not None:
+            unknown = index.unknown({int(c[1:-1]) for c in unique_citations})
+            if unknown:
+                issues.append(f"Citation Shield Breach: {', '.join(f'[{n}]' for n in unknown)} match no paper in the catalog ({len(index)} sources).")
+
         if len(unique_citations) < 3 and matrix_refs >= 3:
             issues.append(f"Citation Shield Gap: Only {len(unique_citations)} unique sources cited (Target: 3+).")
         
@@ -181,6 +193,11 @@ class ConfigManager:
         if hasattr(cli_args, 'mock') and cli_args.mock: config["MOCK_MODE"] = cli_args.mock
         if hasattr(cli_args, 'sources') and cli_args.sources: config["SOURCES"] = cli_args.sources
         if hasattr(cli_args, 'format') and cli_args.format: config["OUTPUT_FORMAT"] = cli_args.format
+        if hasattr(cli_args, 'trace') and cli_args.trace: config["TRACE_DIR"] = cli_args.trace
+        if hasattr(cli_args, 'offline') and cli_args.offline: config["OFFLINE"] = cli_args.offline
+        if hasattr(cli_args, 'batch') and cli_args.batch: config["BATCH_FILE"] = cli_args.batch
+        if hasattr(cli_args, 'workers') and cli_args.workers is not None: config["WORKERS"] = cli_args.workers
+        if hasattr(cli_args, 'queue_db') and cli_args.queue_db: config["QUEUE_DB"] = cli_args.queue_db
 
         # Handle dates with safe attribute access
         start_date = getattr(cli_args, 'after', None)
@@ -202,8 +219,13 @@ class ConfigManager:
         return config
 
 class Orchestrator:
-    def __init__(self, user_config: Dict):
+    def __init__(self, user_config: Dict, rate_limiter=None, cancel_event=None):
         self.user_config = user_config
+        self.rate_limiter = rate_limiter
+        # Set by a batch worker that lost its job lease: stop before writing into the shared build dir
+        self.cancel_event = cancel_event
+        # Catalog ids acquired for this book during the run (the catalog itself is shared)
+        self.selected_ids: List[str] = []
         self.corpus_path = user_config.get("CORPUS_PATH", "./papers")
         self.output_path = user_config.get("OUTPUT_PATH", "./book_out")
         self.book_name = user_config.get("BOOK_NAME", "The Physics of Agentic AI")
@@ -218,7 +240,10 @@ class Orchestrator:
                 self.master_ref = f.read()
 
         self.mock_enabled = self.user_config.get("MOCK_MODE", False)
+        if self.user_config.get("TRACE_DIR"):
+            TRACER.enable()
         self.local_brain = LocalIntelligence()
+        self.router = ModelRouter.from_config(self.user_config)
         self.book_name = self._determine_book_name()
         self._validate_environment()
 
@@ -234,7 +259,7 @@ class Orchestrator:
         if keywords or goal:
             logging.info("Generating dynamic book name based on keywords/goal...")
             prompt = f"Based on the keywords '{keywords}' and research goal '{goal}', generate a short, academic, and industrial book title. Output ONLY the title."
-            title = self._call_llm("Role: Naming Expert", prompt).strip().strip('"').strip("'")
+            title = self._call_llm("Role: Naming Expert", prompt, role="naming").strip().strip('"').strip("'")
             if title and "Error" not in title:
                 return title
         
@@ -245,7 +270,8 @@ class Orchestrator:
         api_key = self.user_config.get("GOOGLE_API_KEY") or os.environ.get("GOOGLE_API_KEY")
         has_key = api_key is not None or "OPENAI_API_KEY" in os.environ
         
-        if not has_key and not self.mock_enabled:
+        # Routes that only name "local" never need a key; the engine loads on first call
+        if not has_key and not self.mock_enabled and not self.router.local_only():
             print("\n⚠️  Security Alert: Real Mode active but no API Key found.")
             print("You have two options:")
             print("1. Enter GOOGLE_API_KEY")
@@ -282,8 +308,11 @@ class Orchestrator:
             logging.error("ERROR: Cannot acquire papers: ResearchEngine module missing.")
             return
 
-        engine = ResearchEngine(self.corpus_path)
-        engine.search_and_download(query, limit, start_date=start_date, end_date=end_date, fetch_mode=fetch_mode, auto_confirm=auto_confirm, sources=sources)
+        engine = ResearchEngine(self.corpus_path,
+                                cache_path=self.user_config.get("SEARCH_CACHE_PATH"),
+                                cache_ttl=float(self.user_config.get("SEARCH_CACHE_TTL", 86400)),
+                                offline=bool(self.user_config.get("OFFLINE", False)))
+        self.selected_ids.extend(engine.search_and_download(query, limit, start_date=start_date, end_date=end_date, fetch_mode=fetch_mode, auto_confirm=auto_confirm, sources=sources) or [])
 
     def _load_prompts(self) -> Dict[str, str]:
         prompt_dir = os.path.join(os.path.dirname(__file__), "prompts")
@@ -310,38 +339,72 @@ class Orchestrator:
         logging.info(f"Antigravity Query: {message}")
         return self._call_llm_with_retry("Role: Intelligent Assistant. Answer the user's question directly.", message)
 
-    def _call_llm_with_retry(self, system_prompt: str, user_content: str, max_retries: int = 3) -> str:
+    def _call_llm_with_retry(self, system_prompt: str, user_content: str, max_retries: int = 3, role: str = "assistant") -> str:
         full_system_prompt = f"{self.master_ref}\n\n### SPECIFIC AGENT ROLE:\n{system_prompt}"
-        self.counter.add(full_system_prompt + user_content)
+        prompt_tokens = self.counter.add(full_system_prompt + user_content)
         attempt = 0
         last_error = None
-        while attempt < max_retries:
-            try:
-                # FIX: Mock Mode Verification FIRST
-                if self.mock_enabled:
-                    return self._mock_llm_response(full_system_prompt)
-                
-                # Check config OR env for key
-                if self.user_config.get("GOOGLE_API_KEY") or "GOOGLE_API_KEY" in os.environ:
-                    response = self._call_real_gemini(full_system_prompt, user_content)
-                    self.counter.add(response)
+        with TRACER.span("llm.call", category="llm", role=role, prompt_tokens=prompt_tokens) as span:
+            while attempt < max_retries:
+                try:
+                    span.set(attempt=attempt + 1)
+                    # FIX: Mock Mode Verification FIRST
+                    if self.mock_enabled:
+                        response = self._mock_llm_response(full_system_prompt)
+                        span.set(model="mock", completion_tokens=len(response) // 4)
+                        return response
+                    
+                    response, model = self._call_routed(role, full_system_prompt, user_content, span)
+                    span.set(model=model, completion_tokens=self.counter.add(response))
                     return response
+                except Exception as e:
+                    attempt += 1
+                    last_error = str(e)
+                    wait_time = 2 ** attempt
+                    logging.error(f"API Error: {e}. Retry {attempt}/{max_retries}...")
+                    time.sleep(wait_time)
+            span.set(error=f"Critical API Failure: {last_error}")
+        return f"Critical API Failure: {last_error}"
+
+    def _call_routed(self, role: str, system_prompt: str, user_content: str, span):
+        """Try the role's models in router order, falling through to the next on error."""
+        has_key = bool(self.user_config.get("GOOGLE_API_KEY") or "GOOGLE_API_KEY" in os.environ)
+        candidates = [m for m in self.router.candidates(role) if m == LOCAL_MODEL or has_key]
+        # A local engine loaded at startup (no key) is always the last resort
+        if self.local_brain.pipeline is not None and LOCAL_MODEL not in candidates:
+            candidates.append(LOCAL_MODEL)
+        if not candidates:
+            raise Exception("No API keys found in Config or Environment, and Mock Mode is OFF.")
+
+        errors = []
+        for model in candidates:
+            start = time.perf_counter()
+            try:
+                if model == LOCAL_MODEL:
+                    if self.local_brain.pipeline is None:
+                        self.local_brain.load_engine(self.user_config.get("LOCAL_MODEL") or self.local_brain.assess_hardware()["recommended_model"])
+                    response = self.local_brain.generate(system_prompt, user_content)
                 else:
-                    raise Exception("No API keys found in Config or Environment, and Mock Mode is OFF.")
+                    if self.rate_limiter:
+                        span.incr("rate_wait_ms", round(self.rate_limiter.acquire() * 1000, 1))
+                    response = self._call_real_gemini(system_prompt, user_content, model_name=model)
+                self.router.record(model, role, time.perf_counter() - start, ok=True)
+                if errors:
+                    span.set(fallbacks=len(errors))
+                return response, model
             except Exception as e:
-                attempt += 1
-                last_error = str(e)
-                wait_time = 2 ** attempt
-                logging.error(f"API Error: {e}. Retry {attempt}/{max_retries}...")
-                time.sleep(wait_time)
-        return f"Critical API Failure: {last_error}"
+                self.router.record(model, role, time.perf_counter() - start, ok=False, error=str(e))
+                errors.append(f"{model}: {e}")
+                if model != candidates[-1]:
+                    logging.warning(f"Model {model} failed for {role} ({e}). Falling back...")
+        raise Exception("; ".join(errors))
 
-    def _call_real_gemini(self, system_prompt: str, user_content: str) -> str:
+    def _call_real_gemini(self, system_prompt: str, user_content: str, model_name: str = None) -> str:
         try:
             import google.generativeai as genai
             api_key = self.user_config.get("GOOGLE_API_KEY") or os.environ.get("GOOGLE_API_KEY")
             genai.configure(api_key=api_key)
-            model_name = self.user_config.get("MODEL_NAME", "gemini-3-flash-preview")
+            model_name = model_name or self.user_config.get("MODEL_NAME", "gemini-3-flash-preview")
             model = genai.GenerativeModel(model_name)
             response = model.generate_content(f"SYSTEM: {system_prompt}\nUSER: {user_content}")
             return response.text
@@ -357,7 +420,9 @@ class Orchestrator:
             return "<synthesis_matrix>\n<topic name='Foundation'>\n<source id='1'>Logic</source>\n<source id='2'>Reasoning</source>\n<source id='3'>Tools</source>\n</topic>\n</synthesis_matrix>\n## Outline\n- Introduction"
         
         if "# The Writer" in role_part or "# ✍️ The Writer" in role_part:
-            return "# Chapter Content\nThe system executes the logic described in [1], [2], and [3]. This approach ensures technical rigor."
+            # Cite only numbers the prompt's source list offers, so small catalogs still pass the local audit
+            listed = re.findall(r'^\[(\d+)\] ', system_prompt, re.MULTILINE)[:3] or ["1", "2", "3"]
+            return f"# Chapter Content\nThe system executes the logic described in {', '.join(f'[{n}]' for n in listed)}. This approach ensures technical rigor."
         
         if "# The Critic" in role_part or "# 🧪 The Critic" in role_part:
             return "Status: PASS"
@@ -386,16 +451,37 @@ class Orchestrator:
         return True
 
     def execute_pipeline(self):
+        try:
+            with TRACER.span("pipeline", book=self.book_name):
+                return self._run_pipeline()
+        finally:
+            self._finalize_trace()
+
+    def _finalize_trace(self):
+        """Export collected spans (JSONL + Chrome trace) and print the per-span summary."""
+        if not TRACER.enabled:
+            return
+        trace_dir = self.user_config.get("TRACE_DIR", "./traces")
+        paths = TRACER.export(trace_dir, prefix=f"{self._sanitize_filename(self.book_name)}_trace")
+        if paths:
+            print("\n📊 Trace Summary")
+            print(TRACER.summary_table())
+            logging.info(f"Trace written to: {paths['jsonl']} (JSONL), {paths['chrome']} (chrome://tracing)")
+        TRACER.spans.clear()
+
+    def _run_pipeline(self):
         logging.info("Starting Pipeline...")
         
         # Phase 0: Acquisition
         if "SEARCH_QUERY" in self.user_config:
-            self._acquire_papers(self.user_config["SEARCH_QUERY"], 
-                                int(self.user_config.get("PAPER_LIMIT", 5)),
-                                start_date=self.user_config.get("START_DATE"),
-                                end_date=self.user_config.get("END_DATE"),
-                                fetch_mode=self.user_config.get("FETCH_MODE", "fulltext"),
-                                auto_confirm=self.user_config.get("AUTO_CONFIRM", False))
+            with TRACER.span("phase.acquisition"):
+                self._acquire_papers(self.user_config["SEARCH_QUERY"], 
+                                    int(self.user_config.get("PAPER_LIMIT", 5)),
+                                    start_date=self.user_config.get("START_DATE"),
+                                    end_date=self.user_config.get("END_DATE"),
+                                    fetch_mode=self.user_config.get("FETCH_MODE", "fulltext"),
+                                    auto_confirm=self.user_config.get("AUTO_CONFIRM", False),
+                                    sources=self.user_config.get("SOURCES", "arxiv").split(","))
 
         docs = glob.glob(os.path.join(self.corpus_path, "**/*.pdf"), recursive=True) + glob.glob(os.path.join(self.corpus_path, "**/*.md"), recursive=True)
         pdf_docs = [d for d in docs if d.endswith(".pdf")]
@@ -431,62 +517,196 @@ class Orchestrator:
 
         manifest = {"chapters": {}, "status": "IN_PROGRESS"} 
         
-        # Step 1: Architect
-        arch_p = self._render_prompt(self.prompts["architect"], {"CORPUS_CONTEXT": "Initial docs"})
-        arch_out = self._call_llm(arch_p, "Design blueprint.")
-        blueprint = re.search(r"##\s+Outline(.*)", arch_out, re.DOTALL | re.IGNORECASE).group(1).strip() if "## Outline" in arch_out else "Default Outline"
+        ctx_budget = int(self.user_config.get("CONTEXT_TOKEN_BUDGET", 2000))
+        safe_name = self._sanitize_filename(self.book_name)
+
+        # Step 1: Architect (incremental against the stored corpus fingerprint)
+        state = self._run_architect(docs, ctx_budget)
+        if self._cancelled():
+            manifest["status"] = "CANCELLED"
+            return manifest
+        blueprint = state.blueprint or "Default Outline"
+        matrix = state.matrix_xml()
+
+        # Citation index: built once, validates every draft locally and streams refs.bib
+        index = CitationIndex.load(self.corpus_path, matrix, paper_ids=state.paper_ids, documents=list(state.documents))
+        bib = BibliographyWriter(os.path.join(self.output_path, safe_name, "refs.bib"), index)
+        matrix_refs = index.available_refs if len(index) else 3
+        # The numbered list gets its own budget so a long matrix cannot crowd out the numbers the auditor accepts
+        writer_matrix = f"{clip_tokens(matrix, ctx_budget)}\n\n{clip_tokens(index.reference_list(), ctx_budget)}".strip() or "None"
         
         # Step 2: Writer Loop
         chapters = ["Chapter 1: Foundation", "Chapter 2: Logic"]
-        prev_summ = "None"
+        # Fixed-size context: summaries -> digests -> registry, plus a clipped blueprint
+        memory = ContextMemory(self._summarize, token_budget=ctx_budget, window=int(self.user_config.get("MEMORY_WINDOW", 5)))
         for i, ch in enumerate(chapters):
-            if i > 0 and i % 5 == 0: 
-                rev_p = self._render_prompt(self.prompts["architect"], {"CORVIOUS_PROGRESS": prev_summ, "CURRENT_BLUEPRINT": blueprint})
-                arch_out = self._call_llm(rev_p, "Update.")
-                blueprint = arch_out 
-
-            logging.info(f"Drafting {ch}...")
-            base_p = self._render_prompt(self.prompts["writer"], {"CHAPTER_TITLE": ch, "BLUEPRINT": blueprint, "PREVIOUS_CHAPTER_SUMMARY": prev_summ})
-            
-            ok, retries, hist = False, 0, [] 
-            while not ok and retries < 3:
-                draft = self._call_llm(base_p, f"Draft {ch}")
-                
-                # Protocol Hardening Pass
-                lint_issues = AntiSlopLinter.lint(draft)
-                # Heuristic: count intended refs from matrix (if accessible)
-                citation_issues = CitationAuditor.audit(draft, matrix_refs=3) 
+            if self._cancelled():
+                manifest["status"] = "CANCELLED"
+                break
+            with TRACER.span("phase.chapter", chapter=ch) as ch_span:
+                ch_path = os.path.join(self.output_path, safe_name, f"{self._sanitize_filename(ch)}.md")
+                if not state.is_dirty(ch) and os.path.exists(ch_path):
+                    # Topic sources unchanged since this chapter was drafted: reuse it
+                    logging.info(f"[Resume] {ch} is up to date with its sources. Skipping.")
+                    with open(ch_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    manifest["chapters"][ch] = "READY"
+                    bib.add(index.cited(content))
+                    memory.add_chapter(ch, content, state.chapters[ch]["summary"])
+                    ch_span.set(status="CLEAN")
+                    continue
+
+                if i > 0 and i % 5 == 0: 
+                    with TRACER.span("phase.architect_revision"):
+                        rev_p = self._render_prompt(self.prompts["architect"], {"PREVIOUS_PROGRESS": memory.context(), "CURRENT_BLUEPRINT": clip_tokens(blueprint, ctx_budget)})
+                        arch_out = self._call_llm(rev_p, "Update.", role="architect")
+                        blueprint = arch_out 
+
+                logging.info(f"Drafting {ch}...")
+                base_p = self._render_prompt(self.prompts["writer"], {"CHAPTER_TITLE": ch, "SYNTHESIS_MATRIX": writer_matrix, "BLUEPRINT": clip_tokens(blueprint, ctx_budget), "PREVIOUS_CHAPTER_SUMMARY": memory.context()})
                 
-                if not self._validate_mermaid(draft): critique = "FAIL: Visuals (Broken Mermaid Syntax)."
-                elif lint_issues: critique = f"FAIL: Protocol Violation. {lint_issues[0]}"
-                elif citation_issues: critique = f"FAIL: {citation_issues[0]}"
-                else: 
-                    critic_p = self._render_prompt(self.prompts["critic"], {"PREVIOUS_CRITIQUES": "\n".join(hist)})
-                    critique = self._call_llm(critic_p, draft)
+                ok, retries, hist = False, 0, [] 
+                feedback = ""
+                while not ok and retries < 3:
+                    with TRACER.span("draft.attempt", attempt=retries + 1) as att_span:
+                        draft = self._call_llm(base_p + feedback, f"Draft {ch}", role="writer")
+                        
+                        # Protocol Hardening Pass
+                        lint_issues = AntiSlopLinter.lint(draft)
+                        citation_issues = CitationAuditor.audit(draft, matrix_refs=matrix_refs, index=index)
+                        
+                        if not self._validate_mermaid(draft): critique = "FAIL: Visuals (Broken Mermaid Syntax)."
+                        elif lint_issues: critique = f"FAIL: Protocol Violation. {lint_issues[0]}"
+                        elif citation_issues: critique = f"FAIL: {citation_issues[0]}"
+                        else: 
+                            critic_p = self._render_prompt(self.prompts["critic"], {"PREVIOUS_CRITIQUES": "\n".join(hist)})
+                            critique = self._call_llm(critic_p, draft, role="critic")
+                        
+                        hist.append(critique)
+                        att_span.set(verdict=critique[:80])
+                        if "Status: PASS" in critique: ok = True
+                        else: 
+                            retries += 1
+                            # Only the latest critique is carried forward; base_p itself never grows
+                            feedback = f"\n\nLATEST PROTOCOL FEEDBACK: {clip_tokens(critique, ctx_budget // 4)}"
                 
-                hist.append(critique)
-                if "Status: PASS" in critique: ok = True
-                else: 
-                    retries += 1
-                    base_p += f"\n\nLATEST PROTOCOL FEEDBACK: {critique}"
-            
-            if ok:
-                self.save_chapter(ch, self._lint_latex_safety(draft))
-                manifest["chapters"][ch] = "READY"
-                s_p = self._render_prompt(self.prompts["summarizer"], {"CHAPTER_CONTENT": draft})
-                prev_summ = self._call_llm(s_p, "Summarize.")
-            else:
-                logging.error(f"FAILURE: Could not draft {ch} after {retries} retries.")
-                logging.error(f"Reason chain: {hist}")
-                manifest["status"] = "BROKEN"
-                break
+                ch_span.set(retries=retries, status="READY" if ok else "BROKEN")
+                if ok and self._cancelled():
+                    manifest["status"] = "CANCELLED"
+                    break
+                if ok:
+                    self.save_chapter(ch, self._lint_latex_safety(draft))
+                    manifest["chapters"][ch] = "READY"
+                    bib.add(index.cited(draft))
+                    summary = self._summarize(draft)
+                    memory.add_chapter(ch, draft, summary)
+                    state.record_chapter(ch, summary)
+                    state.save()
+                else:
+                    logging.error(f"FAILURE: Could not draft {ch} after {retries} retries.")
+                    logging.error(f"Reason chain: {hist}")
+                    manifest["status"] = "BROKEN"
+                    break
 
         if manifest["status"] == "IN_PROGRESS": manifest["status"] = "READY"
         
-        if manifest["status"] == "READY":
+        if manifest["status"] == "READY" and not self._cancelled():
             self.trigger_build_pipeline(manifest)
+        elif manifest["status"] == "CANCELLED" or self._cancelled():
+            manifest["status"] = "CANCELLED"
+            logging.warning("CANCELLED: Job lease lost. Leaving the build directory to the new owner.")
         else:
             logging.error("ABORTED: Incomplete Manifest.")
+        return manifest
+
+    def _run_architect(self, docs: List[str], ctx_budget: int) -> ArchitectState:
+        """Build, reuse or incrementally update the synthesis matrix and blueprint."""
+        state_path = os.path.join(self.output_path, self._sanitize_filename(self.book_name), "architect_state.json")
+        state = ArchitectState.load(state_path)
+        state.paper_ids = list(dict.fromkeys(state.paper_ids + self.selected_ids))
+        if state.paper_ids:
+            # The corpus is shared across a batch: only this book's papers count towards its fingerprint
+            stems = {safe_id(pid) for pid in state.paper_ids}
+            docs = [d for d in docs if os.path.splitext(os.path.basename(d))[0] in stems]
+        documents = corpus_fingerprint(docs, self.corpus_path)
+        delta = state.diff(documents)
+        index = CitationIndex.load(self.corpus_path, paper_ids=state.paper_ids, documents=list(documents))
+
+        with TRACER.span("phase.architect") as span:
+            failed = False
+            if not state.is_built:
+                span.set(mode="full")
+                sources = index.reference_list()
+                arch_p = self._render_prompt(self.prompts["architect"], {"CORPUS_CONTEXT": "Initial docs", "PREVIOUS_PROGRESS": "None", "CURRENT_BLUEPRINT": "None"})
+                arch_out = self._call_llm(arch_p, f"Design blueprint.\n\n### Numbered Sources\n{clip_tokens(sources, ctx_budget)}" if sources else "Design blueprint.", role="architect")
+                failed = self._architect_failed(arch_out)
+                if failed:
+                    # Leave the state unbuilt so the next run retries instead of reusing a fallback outline
+                    logging.error("Architect produced no outline or synthesis matrix. Drafting against a default outline this run only.")
+                else:
+                    state.blueprint = re.search(r"##\s+Outline(.*)", arch_out, re.DOTALL | re.IGNORECASE).group(1).strip() if "## Outline" in arch_out else "Default Outline"
+                    state.topics = parse_synthesis_matrix(arch_out)
+            elif delta["added"] or delta["removed"]:
+                span.set(mode="incremental", added=len(delta["added"]), removed=len(delta["removed"]))
+                logging.info(f"Corpus changed (+{len(delta['added'])} / -{len(delta['removed'])}). Folding into synthesis matrix...")
+                added, removed_ids = self._describe_corpus_delta(delta, index)
+                new_topics = []
+                if added:
+                    # Removals alone are a local edit of the matrix; only new papers need the architect
+                    arch_p = self._render_prompt(self.prompts["architect"], {"CORPUS_CONTEXT": "Corpus update", "PREVIOUS_PROGRESS": "None", "CURRENT_BLUEPRINT": clip_tokens(state.blueprint, ctx_budget)})
+                    update = (f"Fold these corpus changes into the existing synthesis matrix. Output a <synthesis_matrix> containing ONLY the topics "
+                              f"that gain sources from the new papers (new topics allowed). Do not repeat unchanged topics.\n\n"
+                              f"### Current Matrix\n{clip_tokens(state.matrix_xml(), ctx_budget)}\n\n"
+                              f"### New Papers\n{clip_tokens(chr(10).join(added), ctx_budget)}\n\n"
+                              f"### Removed Source Ids\n{', '.join(sorted(removed_ids)) or 'None'}")
+                    arch_out = self._call_llm(arch_p, update, role="architect")
+                    failed = self._architect_failed(arch_out)
+                    new_topics = [] if failed else parse_synthesis_matrix(arch_out)
+                if failed:
+                    # Keep the stored fingerprint so the same delta is folded in on the next run
+                    logging.error("Architect update failed. Keeping the previous synthesis matrix for this run.")
+                else:
+                    affected = state.merge(new_topics, removed_ids)
+                    span.set(affected_topics=len(affected))
+            else:
+                span.set(mode="cached")
+                logging.info("[Resume] Corpus fingerprint unchanged. Reusing synthesis matrix and blueprint.")
+
+            if failed:
+                span.set(error=arch_out[:80])
+            else:
+                state.documents = documents
+            if not self._cancelled():
+                state.save()
+        return state
+
+    @staticmethod
+    def _architect_failed(arch_out: str) -> bool:
+        """True for the retry-exhausted sentinel or an answer with neither an outline nor a synthesis matrix."""
+        return arch_out.startswith("Critical API Failure") or ("## Outline" not in arch_out and "<synthesis_matrix>" not in arch_out)
+
+    def _describe_corpus_delta(self, delta: Dict[str, List[str]], index: CitationIndex):
+        """Describe added documents and collect every source id a removed document may appear under."""
+        by_stem = {safe_id(e.get("id") or ""): (n, e) for n, e in index.by_number.items()}
+        added = []
+        for doc in delta["added"]:
+            n, entry = by_stem.get(os.path.splitext(os.path.basename(doc))[0], (None, None))
+            added.append(f"[{n}] {entry.get('title')} ({entry.get('id')})" if entry else f"- {doc}")
+        removed_ids = set()
+        for doc in delta["removed"]:
+            stem = os.path.splitext(os.path.basename(doc))[0]
+            removed_ids.add(stem)
+            if stem in by_stem:
+                n, entry = by_stem[stem]
+                removed_ids.update({str(n), entry.get("id"), entry.get("citation_key")})
+        return added, removed_ids
+
+    def _cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def _summarize(self, content: str) -> str:
+        s_p = self._render_prompt(self.prompts["summarizer"], {"CHAPTER_CONTENT": content})
+        return self._call_llm(s_p, "Summarize.", role="summarizer")
 
     def _sanitize_filename(self, text: str) -> str:
         # Remove colons, replace spaces, keep alphanumeric/dashes
@@ -495,6 +715,10 @@ class Orchestrator:
         return re.sub(r'[^a-z0-9_.-]', '', stage_1)
 
     def trigger_build_pipeline(self, manifest: Dict):
+        with TRACER.span("phase.build", format=self.user_config.get("OUTPUT_FORMAT", "pdf"), chapters=len(manifest["chapters"])):
+            self._run_build(manifest)
+
+    def _run_build(self, manifest: Dict):
         # 1. Setup Isolated Build Directory
         safe_name = self._sanitize_filename(self.book_name)
         build_dir = os.path.join(self.output_path, safe_name)
@@ -506,7 +730,7 @@ class Orchestrator:
         
         try:
             # 2. Stitch Chapters
-            with open(master_path, 'w', encoding='utf-8') as master:
+            with TRACER.span("build.stitch"), open(master_path, 'w', encoding='utf-8') as master:
                 for ch in manifest["chapters"].keys():
                     fn = f"{self._sanitize_filename(ch)}.md"
                     src_path = os.path.join(build_dir, fn)
@@ -514,37 +738,33 @@ class Orchestrator:
                         with open(src_path, 'r', encoding='utf-8') as f:
                             master.write(f.read() + "\n\n")
             
-            # 3. Create Bibliography
-            bib_path = os.path.join(build_dir, "refs.bib")
-            if not os.path.exists(bib_path):
-                with open(bib_path, 'w') as f: f.write("@misc{placeholder, title={Placeholder}}")
-
-            # 4. Trigger Export
-            output_fmt = self.user_config.get("OUTPUT_FORMAT", "pdf")
-            script = os.path.join(os.path.dirname(__file__), "pdf_exporter.sh")
-            abs_script = os.path.abspath(script)
+            # 3. Trigger Export (refs.bib was streamed by BibliographyWriter while drafting)
+            with TRACER.span("build.export"):
+                output_fmt = self.user_config.get("OUTPUT_FORMAT", "pdf")
+                script = os.path.join(os.path.dirname(__file__), "pdf_exporter.sh")
+                abs_script = os.path.abspath(script)
             
-            if output_fmt == "pdf":
-                if os.path.exists(script):
-                    subprocess.run(["bash", abs_script, self.book_name], cwd=build_dir)
-                    logging.info(f"📚 PDF Generation finished in {build_dir}")
-                else:
-                    logging.warning("⚠️ pdf_exporter.sh not found. Skipping PDF build.")
+                if output_fmt == "pdf":
+                    if os.path.exists(script):
+                        subprocess.run(["bash", abs_script, self.book_name], cwd=build_dir)
+                        logging.info(f"📚 PDF Generation finished in {build_dir}")
+                    else:
+                        logging.warning("⚠️ pdf_exporter.sh not found. Skipping PDF build.")
             
-            elif output_fmt == "epub":
-                logging.info(f"Generating EPUB for {safe_name}...")
-                subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.epub", "--metadata", f"title={self.book_name}"], cwd=build_dir)
+                elif output_fmt == "epub":
+                    logging.info(f"Generating EPUB for {safe_name}...")
+                    subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.epub", "--metadata", f"title={self.book_name}"], cwd=build_dir)
                 
-            elif output_fmt == "docx":
-                logging.info(f"Generating DOCX for {safe_name}...")
-                subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.docx", "--metadata", f"title={self.book_name}"], cwd=build_dir)
+                elif output_fmt == "docx":
+                    logging.info(f"Generating DOCX for {safe_name}...")
+                    subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.docx", "--metadata", f"title={self.book_name}"], cwd=build_dir)
                 
-            elif output_fmt == "latex":
-                logging.info(f"Generating LaTeX for {safe_name}...")
-                subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.tex", "--metadata", f"title={self.book_name}"], cwd=build_dir)
+                elif output_fmt == "latex":
+                    logging.info(f"Generating LaTeX for {safe_name}...")
+                    subprocess.run(["pandoc", master_fn, "-o", f"{safe_name}.tex", "--metadata", f"title={self.book_name}"], cwd=build_dir)
 
-            elif output_fmt == "json":
-                logging.info("JSON Metadata export skipped (managed by catalog).")
+                elif output_fmt == "json":
+                    logging.info("JSON Metadata export skipped (managed by catalog).")
 
         except Exception as e:
             logging.error(f"❌ Mastering failed: {e}")
@@ -574,9 +794,18 @@ if __name__ == "__main__":
     parser.add_argument("-B", "--between", help="Fetch papers published BETWEEN these dates (YYYY-MM-DD,YYYY-MM-DD)")
     parser.add_argument("-S", "--sources", help="Comma-separated list of sources (arxiv,semanticscholar,crossref)")
     parser.add_argument("-F", "--format", choices=["pdf", "html", "epub", "docx", "latex", "json", "md"], help="Final output format")
+    parser.add_argument("--trace", nargs="?", const="./traces", metavar="DIR", help="Record spans for every phase/LLM call and export JSONL + Chrome trace to DIR")
+    parser.add_argument("--offline", action="store_true", help="Serve provider searches only from the local search cache (no network)")
+    parser.add_argument("--batch", metavar="QUEUE_FILE", help="Build every book spec in a JSONL queue file (title, keywords, sources, format)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --batch")
+    parser.add_argument("--queue-db", help="SQLite queue/rate-limit database for --batch")
     
     args = parser.parse_args()
     
     cfg = ConfigManager.load(args)
 
-    Orchestrator(cfg).execute_pipeline()
+    if cfg.get("BATCH_FILE"):
+        from job_queue import run_batch
+        run_batch(cfg)
+    else:
+        Orchestrator(cfg).execute_pipeline()
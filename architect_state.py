@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set
+
+
+def corpus_fingerprint(docs: List[str], root: str) -> Dict[str, str]:
+    """Content hash per corpus document, keyed by path relative to the corpus root."""
+    hashes = {}
+    for path in docs:
+        digest = hashlib.sha1()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError as e:
+            logging.warning(f"Fingerprint skipped {path}: {e}")
+            continue
+        hashes[os.path.relpath(path, root)] = digest.hexdigest()
+    return hashes
+
+
+def parse_synthesis_matrix(text: str) -> List[Dict]:
+    """Parse `<topic>/<source>/<synthesis>` tags into structured topics (tolerant of malformed XML)."""
+    topics = []
+    for name, body in re.findall(r'<topic\s+name=[\'"]([^\'"]+)[\'"]\s*>(.*?)</topic>', text or "", re.DOTALL):
+        sources = [{"id": sid.strip(), "text": stext.strip()}
+                   for sid, stext in re.findall(r'<source\s+id=[\'"]([^\'"]+)[\'"]\s*>(.*?)</source>', body, re.DOTALL)]
+        synthesis = re.search(r'<synthesis>(.*?)</synthesis>', body, re.DOTALL)
+        topics.append({"name": name.strip(), "sources": sources, "synthesis": synthesis.group(1).strip() if synthesis else ""})
+    return topics
+
+
+def render_synthesis_matrix(topics: List[Dict]) -> str:
+    lines = ["<synthesis_matrix>"]
+    for topic in topics:
+        lines.append(f"<topic name='{topic['name']}'>")
+        for src in topic["sources"]:
+            lines.append(f"<source id='{src['id']}'>{src['text']}</source>")
+        if topic.get("synthesis"):
+            lines.append(f"<synthesis>{topic['synthesis']}</synthesis>")
+        lines.append("</topic>")
+    lines.append("</synthesis_matrix>")
+    return "\n".join(lines)
+
+
+class ArchitectState:
+    """Phase 1.2: Persisted architect output keyed on a corpus fingerprint.
+
+    Stores the parsed synthesis matrix, the blueprint, the per-document hashes they
+    were built from, and the topic sources each chapter was drafted against. A
+    changed corpus is folded in incrementally and only chapters whose sources
+    moved are redrafted.
+    """
+
+    def __init__(self, path: str, data: Optional[Dict] = None):
+        self.path = path
+        data = data or {}
+        self.documents: Dict[str, str] = data.get("documents", {})
+        self.topics: List[Dict] = data.get("topics", [])
+        self.blueprint: Optional[str] = data.get("blueprint")
+        self.chapters: Dict[str, Dict] = data.get("chapters", {})
+        # Catalog ids selected for this book, in citation-number order
+        self.paper_ids: List[str] = data.get("paper_ids", [])
+
+    @classmethod
+    def load(cls, path: str) -> "ArchitectState":
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return cls(path, json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Architect state unreadable, rebuilding: {e}")
+        return cls(path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "documents": self.documents,
+                "topics": self.topics,
+                "blueprint": self.blueprint,
+                "chapters": self.chapters,
+                "paper_ids": self.paper_ids,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def is_built(self) -> bool:
+        return self.blueprint is not None
+
+    def diff(self, documents: Dict[str, str]) -> Dict[str, List[str]]:
+        """Documents added (new or content changed) and removed since the stored build."""
+        added = [d for d, h in documents.items() if self.documents.get(d) != h]
+        removed = [d for d in self.documents if d not in documents]
+        return {"added": sorted(added), "removed": sorted(removed)}
+
+    def matrix_xml(self) -> str:
+        return render_synthesis_matrix(self.topics) if self.topics else ""
+
+    def merge(self, new_topics: List[Dict], removed_ids: Set[str]) -> Set[str]:
+        """Fold an incremental architect answer into the stored matrix. Returns the affected topic names."""
+        affected = set()
+        if removed_ids:
+            for topic in self.topics:
+                kept = [s for s in topic["sources"] if s["id"] not in removed_ids]
+                if len(kept) != len(topic["sources"]):
+                    topic["sources"] = kept
+                    affected.add(topic["name"])
+        by_name = {t["name"].lower(): t for t in self.topics}
+        for topic in new_topics:
+            existing = by_name.get(topic["name"].lower())
+            if existing is None:
+                self.topics.append(topic)
+                by_name[topic["name"].lower()] = topic
+            else:
+                known = {s["id"] for s in existing["sources"]}
+                existing["sources"].extend(s for s in topic["sources"] if s["id"] not in known)
+                if topic.get("synthesis"):
+                    existing["synthesis"] = topic["synthesis"]
+            affected.add(topic["name"])
+        return affected
+
+    def chapter_sources(self, chapter: str) -> List[str]:
+        """Source ids feeding a chapter: its matching topics, or every topic when none match by name."""
+        matched = [t for t in self.topics if t["name"].lower() in chapter.lower()]
+        return sorted({s["id"] for t in (matched or self.topics) for s in t["sources"]})
+
+    def is_dirty(self, chapter: str) -> bool:
+        record = self.chapters.get(chapter)
+        return record is None or record.get("sources") != self.chapter_sources(chapter)
+
+    def record_chapter(self, chapter: str, summary: str):
+        self.chapters[chapter] = {"sources": self.chapter_sources(chapter), "summary": summary}
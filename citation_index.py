@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import logging
+from typing import Dict, List, Optional, Set
+
+
+CITATION_PATTERN = re.compile(r'\[(\d+)\]')
+
+
+class CitationIndex:
+    """Phase 1.3: Maps `[N]` citation numbers to research catalog entries.
+
+    Built once per run from the book's own papers in `research_catalog.json`
+    (the shared catalog also holds other books' papers) plus the architect's
+    `<synthesis_matrix>`, so every draft can be checked locally instead of
+    through a critic LLM call. Numbers follow selection order (1-based) and
+    stay stable as the book's corpus grows.
+    """
+
+    def __init__(self, entries: List[Dict], matrix_xml: str = ""):
+        self.entries = entries
+        self.by_number: Dict[int, Dict] = {}
+        self.by_key: Dict[str, int] = {}
+        for n, entry in enumerate(entries, 1):
+            key = self.bibtex_key(entry, n)
+            entry["citation_key"] = key
+            self.by_number[n] = entry
+            self.by_key[key] = n
+        self.matrix_refs = self._resolve_matrix(matrix_xml)
+
+    @classmethod
+    def load(cls, corpus_path: str, matrix_xml: str = "", paper_ids: Optional[List[str]] = None,
+             documents: Optional[List[str]] = None) -> "CitationIndex":
+        """Index the catalog entries selected for this book (`paper_ids`), or those whose file is in `documents`."""
+        catalog_path = os.path.join(corpus_path, "research_catalog.json")
+        entries = []
+        if os.path.exists(catalog_path):
+            try:
+                with open(catalog_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Citation index: catalog unreadable ({e}).")
+        if paper_ids:
+            by_id = {e.get("id"): e for e in entries}
+            entries = [by_id[pid] for pid in dict.fromkeys(paper_ids) if pid in by_id]
+        elif documents is not None:
+            stems = {os.path.splitext(os.path.basename(d))[0] for d in documents}
+            entries = [e for e in entries if safe_id(e.get("id") or "") in stems]
+        return cls(entries, matrix_xml)
+
+    @staticmethod
+    def bibtex_key(entry: Dict, n: int) -> str:
+        authors = entry.get("authors") or []
+        surname = authors[0].split()[-1] if authors and authors[0].strip() else "anon"
+        word = next((w for w in re.findall(r'[A-Za-z]+', entry.get("title") or "") if len(w) > 3), "paper")
+        return re.sub(r'[^a-z0-9]', '', f"{surname}{word}".lower()) + str(n)
+
+    def _resolve_matrix(self, matrix_xml: str) -> Set[int]:
+        """Resolve `<source id=...>` values (numbers, paper ids or titles) to citation numbers."""
+        refs = set()
+        for sid in re.findall(r'<source\s+id=[\'"]([^\'"]+)[\'"]', matrix_xml or ""):
+            sid = sid.strip()
+            if sid.isdigit():
+                if int(sid) in self.by_number:
+                    refs.add(int(sid))
+                continue
+            for n, entry in self.by_number.items():
+                if sid in (entry.get("id"), entry.get("citation_key")) or sid.lower() == (entry.get("title") or "").lower():
+                    refs.add(n)
+                    break
+        return refs
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def available_refs(self) -> int:
+        return min(len(self.matrix_refs), len(self.entries)) if self.matrix_refs else len(self.entries)
+
+    def cited(self, text: str) -> Set[int]:
+        return {int(n) for n in CITATION_PATTERN.findall(text)}
+
+    def unknown(self, numbers: Set[int]) -> List[int]:
+        """Citation numbers that resolve to no catalog entry (empty when there is no catalog)."""
+        if not self.entries:
+            return []
+        return sorted(n for n in numbers if n not in self.by_number)
+
+    def reference_list(self) -> str:
+        """Numbered source list handed to the architect/writer so `[N]` means catalog entry N."""
+        lines = []
+        for n, entry in self.by_number.items():
+            authors = ", ".join((entry.get("authors") or [])[:3])
+            lines.append(f"[{n}] {entry.get('title')} — {authors} ({entry.get('source')}: {entry.get('id')})")
+        return "\n".join(lines)
+
+    def to_bibtex(self, n: int) -> str:
+        entry = self.by_number[n]
+        source = entry.get("source")
+        fields = {
+            "title": "{" + _bib_escape(entry.get("title") or "Untitled") + "}",
+            "author": " and ".join(_bib_escape(a) for a in entry.get("authors") or []) or "Unknown",
+            "url": entry.get("url"),
+        }
+        kind = "misc"
+        if source == "arxiv":
+            fields["eprint"] = re.sub(r'v\d+$', '', entry.get("id") or "")
+            fields["archivePrefix"] = "arXiv"
+        elif source == "crossref":
+            kind = "article"
+            fields["doi"] = entry.get("id")
+        body = ",\n".join(f"  {k} = {{{v}}}" for k, v in fields.items() if v)
+        return f"@{kind}{{{entry['citation_key']},\n{body}\n}}\n"
+
+
+class BibliographyWriter:
+    """Streams BibTeX entries to refs.bib as chapters cite them (each entry written once)."""
+
+    def __init__(self, path: str, index: CitationIndex):
+        self.path = path
+        self.index = index
+        self.emitted: Set[int] = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("% Generated by antigravity-factory from research_catalog.json\n\n")
+
+    def add(self, numbers: Set[int]) -> int:
+        new = sorted(n for n in numbers if n in self.index.by_number and n not in self.emitted)
+        if new:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for n in new:
+                    f.write(self.index.to_bibtex(n) + "\n")
+            self.emitted.update(new)
+        return len(new)
+
+
+def safe_id(paper_id: str) -> str:
+    """Corpus filename stem the fetcher stores a paper under."""
+    return paper_id.replace("/", "_").replace(":", "_")
+
+
+def _bib_escape(text: str) -> str:
+    return text.replace("{", "\\{").replace("}", "\\}").replace("&", "\\&").replace("%", "\\%")
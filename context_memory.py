@@ -0,0 +1,121 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    # Same heuristic as TokenCounter: ~4 characters per token
+    return len(text) // 4
+
+
+def clip_tokens(text: str, budget: int) -> str:
+    """Trim text to roughly `budget` tokens."""
+    max_chars = max(0, budget) * 4
+    if len(text) <= max_chars:
+        return text
+    if max_chars == 0:
+        return ""
+    return text[:max_chars - 1] + "…"
+
+
+class ContextMemory:
+    """Phase 1.1 (Strategy A): Bounded hierarchical context (chapter summaries -> digests -> registry).
+
+    Older chapter summaries are folded into digests (summaries of summaries) every
+    `window` chapters; `context()` never exceeds `token_budget`, so prompt size stays
+    flat from chapter 1 to chapter 100.
+    """
+    TERM_PATTERN = re.compile(r'\*\*([^*\n]{2,60})\*\*\s*(?:[:—–-]|is|are|refers to)\s*([^\n]{8,240})')
+    CITATION_PATTERN = re.compile(r'\[(\d+)\]')
+
+    def __init__(self, summarize: Callable[[str], str], token_budget: int = 2000, window: int = 5):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.window = max(2, window)
+        # levels[0] = chapter summaries, levels[n] = digests of level n-1
+        self.levels: List[List[Tuple[str, str]]] = [[]]
+        self.terms: Dict[str, str] = {}
+        self.citations: Dict[str, List[str]] = {}
+
+    def add_chapter(self, title: str, content: str, summary: str):
+        self._register(title, content)
+        self._push(0, title, summary)
+
+    def _push(self, level: int, label: str, text: str):
+        if level == len(self.levels):
+            self.levels.append([])
+        self.levels[level].append((label, text))
+        if len(self.levels[level]) > self.window:
+            # Fold the oldest `window` entries into one digest one level up
+            batch, self.levels[level] = self.levels[level][:self.window], self.levels[level][self.window:]
+            label = f"{batch[0][0].split(' … ')[0]} … {batch[-1][0].split(' … ')[-1]}"
+            joined = "\n\n".join(f"{l}: {t}" for l, t in batch)
+            self._push(level + 1, label, self.summarize(clip_tokens(joined, self.token_budget)))
+
+    def _register(self, title: str, content: str):
+        # Registries are kept in least- to most-recently-used order (re-inserting moves an entry to the end)
+        lowered = content.lower()
+        defined = {term.strip(): definition.strip() for term, definition in self.TERM_PATTERN.findall(content)}
+        for term in [t for t in self.terms if t not in defined and re.search(r'\b' + re.escape(t.lower()) + r'\b', lowered)]:
+            self.terms[term] = self.terms.pop(term)
+        for term, definition in defined.items():
+            self.terms.pop(term, None)
+            self.terms[term] = definition
+        for ref in dict.fromkeys(self.CITATION_PATTERN.findall(content)):
+            chapters = self.citations.pop(ref, [])
+            if title not in chapters:
+                chapters.append(title)
+            self.citations[ref] = chapters
+
+    def _render_registry(self, budget: int) -> str:
+        """Most recently used terms and citations first, so clipping drops the stalest entries."""
+        lines = []
+        if self.terms:
+            lines.append(clip_tokens("Terms: " + "; ".join(f"{t} = {d}" for t, d in reversed(self.terms.items())), budget * 2 // 3))
+        if self.citations:
+            lines.append(clip_tokens("Cited recently: " + ", ".join(f"[{r}]" for r in reversed(self.citations)), budget // 3))
+        return "\n".join(lines)
+
+    def context(self, budget: Optional[int] = None) -> str:
+        """Assemble recent summaries, digests and the registry within a fixed token budget."""
+        budget = budget or self.token_budget
+        if not self.levels[0] and len(self.levels) == 1:
+            return "None"
+
+        # Budget split: most recent chapters first, then the long-range arc, then the registry
+        recent_budget = budget * 5 // 10
+        arc_budget = budget * 3 // 10
+        registry_budget = budget - recent_budget - arc_budget
+
+        recent, used = [], 0
+        for label, text in reversed(self.levels[0]):
+            entry = f"- {label}: {text}"
+            cost = estimate_tokens(entry)
+            if used + cost > recent_budget:
+                if not recent:
+                    recent.append(clip_tokens(entry, recent_budget))
+                break
+            recent.insert(0, entry)
+            used += cost
+
+        # Newest digests first (level 1 upwards) so the budget drops the oldest stretch of the book
+        arc, used = [], 0
+        for label, text in (entry for level in self.levels[1:] for entry in reversed(level)):
+            entry = f"- {label}: {text}"
+            cost = estimate_tokens(entry)
+            if used + cost > arc_budget:
+                if not arc:
+                    arc.append(clip_tokens(entry, arc_budget))
+                break
+            arc.insert(0, entry)
+            used += cost
+        arc_text = "\n".join(arc)
+
+        sections = []
+        if arc_text:
+            sections.append("#### Book So Far\n" + arc_text)
+        if recent:
+            sections.append("#### Recent Chapters\n" + "\n".join(recent))
+        registry = self._render_registry(registry_budget)
+        if registry:
+            sections.append("#### Registry\n" + registry)
+        return "\n\n".join(sections)
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+import multiprocessing
+from typing import Dict, List, Optional
+
+
+class JobQueue:
+    """Batch Mode: SQLite-backed book queue with leases, heartbeats and retry of abandoned jobs."""
+
+    def __init__(self, db_path: str, lease_seconds: int = 600, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        parent = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_key TEXT UNIQUE NOT NULL,
+                    spec TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    updated REAL
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, spec: Dict) -> bool:
+        """Add a book spec. Identical specs are only queued once (safe to re-run a batch file)."""
+        payload = json.dumps(spec, sort_keys=True)
+        job_key = spec.get("id") or spec.get("request_id") or hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        with self._connect() as conn:
+            cur = conn.execute("INSERT OR IGNORE INTO jobs (job_key, spec, updated) VALUES (?, ?, ?)", (str(job_key), payload, time.time()))
+            return cur.rowcount > 0
+
+    def enqueue_file(self, path: str) -> int:
+        added = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    spec = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.error(f"Skipping malformed queue line {line_no}: {e}")
+                    continue
+                if self.enqueue(spec):
+                    added += 1
+        return added
+
+    def lease(self, owner: str) -> Optional[Dict]:
+        """Atomically claim the next pending job, reclaiming expired leases first."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim_expired(conn, now)
+            row = conn.execute("SELECT id, spec, attempts FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job_id, spec, attempts = row
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, now, job_id))
+            conn.execute("COMMIT")
+            return {"id": job_id, "spec": json.loads(spec), "attempt": attempts + 1}
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _reclaim_expired(self, conn: sqlite3.Connection, now: float):
+        rows = conn.execute("SELECT id, attempts, lease_owner FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)).fetchall()
+        for job_id, attempts, owner in rows:
+            status = "pending" if attempts < self.max_attempts else "failed"
+            logging.warning(f"Job {job_id} lease abandoned by {owner}; marking {status}.")
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, updated = ? WHERE id = ?",
+                (status, f"Lease expired (owner {owner})", now, job_id))
+
+    def heartbeat(self, job_id: int, owner: str) -> bool:
+        """Extend the lease. Returns False if the lease was lost to another worker."""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, job_id, owner))
+            return cur.rowcount > 0
+
+    def complete(self, job_id: int, owner: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated = ? WHERE id = ? AND lease_owner = ?",
+                (time.time(), job_id, owner))
+
+    def fail(self, job_id: int, owner: str, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'pending' ELSE 'failed' END, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = ?, updated = ? WHERE id = ? AND lease_owner = ?",
+                (self.max_attempts, error, time.time(), job_id, owner))
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def has_open_jobs(self) -> bool:
+        counts = self.counts()
+        return counts.get("pending", 0) + counts.get("leased", 0) > 0
+
+
+class SharedRateLimiter:
+    """Token bucket persisted in SQLite so every worker process draws from one API budget."""
+
+    def __init__(self, db_path: str, requests_per_minute: float = 60, capacity: float = 1.0, name: str = "llm"):
+        self.db_path = db_path
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self.name = name
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO rate_limits (name, tokens, updated) VALUES (?, ?, ?)", (name, self.capacity, time.time()))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def acquire(self) -> float:
+        """Block until a request slot is available. Returns the time spent waiting (seconds)."""
+        waited = 0.0
+        while True:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                tokens, updated = conn.execute("SELECT tokens, updated FROM rate_limits WHERE name = ?", (self.name,)).fetchone()
+                now = time.time()
+                tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+                if tokens >= 1.0:
+                    conn.execute("UPDATE rate_limits SET tokens = ?, updated = ? WHERE name = ?", (tokens - 1.0, now, self.name))
+                    conn.execute("COMMIT")
+                    return waited
+                conn.execute("UPDATE rate_limits SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, self.name))
+                conn.execute("COMMIT")
+                delay = (1.0 - tokens) / self.rate
+            finally:
+                conn.close()
+            time.sleep(delay)
+            waited += delay
+
+
+def spec_to_config(base_config: Dict, spec: Dict) -> Dict:
+    """Map a queue line (title, keywords, sources, format, ...) onto a factory config."""
+    config = dict(base_config)
+    mapping = {
+        "title": "BOOK_NAME",
+        "keywords": "KEYWORDS",
+        "goal": "RESEARCH_GOAL",
+        "sources": "SOURCES",
+        "format": "OUTPUT_FORMAT",
+        "limit": "PAPER_LIMIT",
+        "fetch_mode": "FETCH_MODE",
+        "after": "START_DATE",
+        "before": "END_DATE",
+    }
+    for key, cfg_key in mapping.items():
+        if spec.get(key) not in (None, ""):
+            value = spec[key]
+            if key == "sources" and isinstance(value, list):
+                value = ",".join(value)
+            config[cfg_key] = value
+
+    config["SEARCH_QUERY"] = config.get("KEYWORDS") or config.get("RESEARCH_GOAL") or base_config.get("SEARCH_QUERY")
+    if not config["SEARCH_QUERY"]:
+        config.pop("SEARCH_QUERY")
+    # Workers run unattended
+    config["AUTO_CONFIRM"] = True
+    return config
+
+
+def _worker_main(worker_id: str, base_config: Dict, db_path: str):
+    from agents_orchestrator import Orchestrator
+
+    queue = JobQueue(db_path, lease_seconds=int(base_config.get("LEASE_SECONDS", 600)), max_attempts=int(base_config.get("MAX_ATTEMPTS", 3)))
+    limiter = SharedRateLimiter(db_path, requests_per_minute=float(base_config.get("RATE_LIMIT_RPM", 60)))
+    poll_interval = float(base_config.get("QUEUE_POLL_SECONDS", 5))
+
+    while True:
+        job = queue.lease(worker_id)
+        if job is None:
+            # Other workers may still abandon leases that we need to pick up
+            if not queue.has_open_jobs():
+                break
+            time.sleep(poll_interval)
+            continue
+
+        spec = job["spec"]
+        logging.info(f"[{worker_id}] Leased job {job['id']} (attempt {job['attempt']}): {spec.get('title') or spec.get('keywords')}")
+
+        stop = threading.Event()
+        lost = threading.Event()
+        def _beat():
+            interval = queue.lease_seconds / 3
+            deadline = time.time() + queue.lease_seconds
+            wait = interval
+            while not stop.wait(wait):
+                attempted = time.time()
+                try:
+                    renewed = queue.heartbeat(job["id"], worker_id)
+                except Exception as e:
+                    # e.g. "database is locked" under contention: retry until the lease would have expired
+                    if time.time() >= deadline:
+                        logging.warning(f"[{worker_id}] Heartbeat failing past lease expiry on job {job['id']} ({e}). Cancelling pipeline.")
+                        lost.set()
+                        return
+                    logging.warning(f"[{worker_id}] Heartbeat failed on job {job['id']}: {e}. Retrying.")
+                    wait = min(interval, 5.0)
+                    continue
+                if not renewed:
+                    logging.warning(f"[{worker_id}] Lost lease on job {job['id']}. Cancelling pipeline.")
+                    lost.set()
+                    return
+                deadline = attempted + queue.lease_seconds
+                wait = interval
+        beater = threading.Thread(target=_beat, daemon=True)
+        beater.start()
+
+        try:
+            cfg = spec_to_config(base_config, spec)
+            manifest = Orchestrator(cfg, rate_limiter=limiter, cancel_event=lost).execute_pipeline()
+            if lost.is_set():
+                # Another worker owns the job now; it records the outcome
+                logging.warning(f"[{worker_id}] Job {job['id']} abandoned after lease loss.")
+            elif manifest and manifest.get("status") == "READY":
+                queue.complete(job["id"], worker_id)
+                logging.info(f"[{worker_id}] Job {job['id']} complete.")
+            else:
+                queue.fail(job["id"], worker_id, "Incomplete manifest")
+        except Exception as e:
+            logging.error(f"[{worker_id}] Job {job['id']} failed: {e}")
+            queue.fail(job["id"], worker_id, str(e))
+        finally:
+            stop.set()
+            beater.join()
+
+
+def run_batch(config: Dict) -> Dict[str, int]:
+    """Enqueue BATCH_FILE and drain the queue with a pool of WORKERS processes."""
+    db_path = config.get("QUEUE_DB", "./factory_queue.sqlite")
+    queue = JobQueue(db_path, lease_seconds=int(config.get("LEASE_SECONDS", 600)), max_attempts=int(config.get("MAX_ATTEMPTS", 3)))
+    # Creates the shared bucket row before workers race for it
+    SharedRateLimiter(db_path, requests_per_minute=float(config.get("RATE_LIMIT_RPM", 60)))
+
+    if config.get("BATCH_FILE"):
+        added = queue.enqueue_file(config["BATCH_FILE"])
+        logging.info(f"Queued {added} new book(s) from {config['BATCH_FILE']}.")
+
+    n_workers = max(1, int(config.get("WORKERS", 2)))
+    run_id = uuid.uuid4().hex[:6]
+    procs: List[multiprocessing.Process] = []
+    for i in range(n_workers):
+        worker_id = f"worker-{run_id}-{i}"
+        p = multiprocessing.Process(target=_worker_main, args=(worker_id, config, db_path), name=worker_id)
+        p.start()
+        procs.append(p)
+    for p in procs:
+        p.join()
+
+    counts = queue.counts()
+    logging.info(f"Batch finished: {counts}")
+    return counts
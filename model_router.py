@@ -0,0 +1,117 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Union
+
+LOCAL_MODEL = "local"
+ROLES = ("architect", "writer", "critic", "summarizer", "naming", "assistant")
+
+
+class ModelHealth:
+    """Error-rate tracker for one model, with latency (EWMA) and demotion kept per role.
+
+    Roles send very different prompts (a draft vs. a critique), so one latency
+    figure per model would judge fast critic calls by slow drafting calls.
+    """
+
+    def __init__(self, window: int = 20, alpha: float = 0.3):
+        self.outcomes = deque(maxlen=window)
+        self.alpha = alpha
+        self.latency: Dict[str, float] = {}
+        self.cooldown_until = 0.0
+        self.demoted_until: Dict[str, float] = {}
+
+    def record(self, role: str, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            previous = self.latency.get(role)
+            self.latency[role] = latency if previous is None else self.alpha * latency + (1 - self.alpha) * previous
+
+    def forget(self, role: str):
+        """Drop the rolling stats so the next calls re-measure the model from scratch."""
+        self.outcomes.clear()
+        self.latency.pop(role, None)
+        self.demoted_until.pop(role, None)
+
+    @property
+    def error_rate(self) -> float:
+        return 0.0 if not self.outcomes else 1 - sum(self.outcomes) / len(self.outcomes)
+
+
+class ModelRouter:
+    """Per-role model routing with latency/error-aware fallback.
+
+    Each role maps to an ordered list of models (`"local"` = LocalIntelligence).
+    A model is skipped while it is cooling down after saturation (429/quota),
+    while its error rate exceeds `max_error_rate`, or while its smoothed latency
+    exceeds the role's latency budget; it is still tried as a last resort.
+    A demoted model gets no new samples while its fallback succeeds, so the
+    demotion lasts `cooldown` seconds, after which its stats are dropped and it
+    is probed again.
+    """
+    SATURATION_MARKERS = ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit", "503", "overloaded")
+
+    def __init__(self, routes: Dict[str, List[str]], latency_budgets: Optional[Dict[str, float]] = None,
+                 max_error_rate: float = 0.5, cooldown: float = 60.0, min_samples: int = 3):
+        self.routes = routes
+        self.latency_budgets = latency_budgets or {}
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.health: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ModelRouter":
+        default = config.get("MODEL_NAME", "gemini-3-flash-preview")
+        configured: Dict[str, Union[str, List[str]]] = config.get("MODEL_ROUTES") or {}
+        routes = {}
+        for role in set(ROLES) | set(configured):
+            models = configured.get(role) or configured.get("default") or default
+            routes[role] = [models] if isinstance(models, str) else list(models)
+        return cls(routes,
+                   latency_budgets=config.get("MODEL_LATENCY_BUDGETS"),
+                   max_error_rate=float(config.get("MODEL_MAX_ERROR_RATE", 0.5)),
+                   cooldown=float(config.get("MODEL_COOLDOWN_SECONDS", 60)))
+
+    def _health(self, model: str) -> ModelHealth:
+        if model not in self.health:
+            self.health[model] = ModelHealth()
+        return self.health[model]
+
+    def _is_healthy(self, model: str, role: str) -> bool:
+        h = self._health(model)
+        if time.time() < h.cooldown_until:
+            return False
+        budget = self.latency_budgets.get(role)
+        erroring = len(h.outcomes) >= self.min_samples and h.error_rate > self.max_error_rate
+        latency = h.latency.get(role)
+        slow = bool(budget and latency is not None and latency > budget)
+        if not (erroring or slow):
+            h.demoted_until.pop(role, None)
+            return True
+        now = time.time()
+        if role not in h.demoted_until:
+            h.demoted_until[role] = now + self.cooldown
+        elif now >= h.demoted_until[role]:
+            h.forget(role)
+            return True
+        return False
+
+    def candidates(self, role: str) -> List[str]:
+        """Models to try for a role: healthy ones in configured order, then the rest as last resort."""
+        models = self.routes.get(role) or self.routes.get("assistant") or []
+        with self._lock:
+            healthy = [m for m in models if self._is_healthy(m, role)]
+        return healthy + [m for m in models if m not in healthy]
+
+    def local_only(self) -> bool:
+        """True when every role routes exclusively to the local engine (no API key needed)."""
+        return all(m == LOCAL_MODEL for role in self.routes for m in self.candidates(role))
+
+    def record(self, model: str, role: str, latency: float, ok: bool, error: str = ""):
+        with self._lock:
+            h = self._health(model)
+            h.record(role, latency, ok)
+            if not ok and any(marker in error.lower() for marker in self.SATURATION_MARKERS):
+                h.cooldown_until = time.time() + self.cooldown
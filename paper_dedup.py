@@ -0,0 +1,210 @@
+import re
+import json
+import sqlite3
+import hashlib
+from typing import Dict, List, Optional
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Open-access preference when several records offer a PDF
+PDF_SOURCE_RANK = {"arxiv": 0, "semanticscholar": 1, "crossref": 2}
+PLACEHOLDER_ABSTRACT = "No abstract available."
+# Generic titles shared by unrelated records (front matter, missing metadata) never match on title alone
+PLACEHOLDER_TITLES = {"unknown", "untitled", "notitle", "introduction", "editorial", "preface", "foreword",
+                      "abstract", "contents", "tableofcontents", "index", "erratum", "corrigendum", "frontmatter",
+                      "backmatter", "bookreview", "reviewers", "conclusion", "references"}
+
+
+def normalize_title(title: str) -> str:
+    """Case/punctuation/whitespace-insensitive title key."""
+    return re.sub(r'[^a-z0-9]+', '', (title or "").lower())
+
+
+def title_key(title: str) -> Optional[str]:
+    """Title key usable for matching, or None for placeholder/too-short titles."""
+    key = normalize_title(title)
+    return key if len(key) >= 8 and key not in PLACEHOLDER_TITLES else None
+
+
+def author_surnames(authors: List[str]) -> set:
+    return {re.sub(r'[^a-z]', '', a.split()[-1].lower()) for a in authors or [] if a.strip()} - {""}
+
+
+def _add_alias(aliases: Dict[str, List[str]], source: str, alias: str):
+    ids = aliases.setdefault(source, [])
+    if alias not in ids:
+        ids.append(alias)
+
+
+def _shingles(text: str, k: int = 3) -> set:
+    # Crossref abstracts arrive wrapped in JATS markup
+    words = re.findall(r'[a-z0-9]+', re.sub(r'<[^>]+>', ' ', text or "").lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """Deterministic MinHash signatures (stable across processes, unlike hash())."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        params = hashlib.sha256(f"minhash-{seed}".encode()).digest()
+        self.perms = []
+        for i in range(num_perm):
+            h = hashlib.sha256(params + i.to_bytes(4, "big")).digest()
+            a = int.from_bytes(h[:8], "big") % (MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(h[8:16], "big") % MERSENNE_PRIME
+            self.perms.append((a, b))
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") for s in shingles]
+        p = MERSENNE_PRIME
+        return [min([(a * h + b) % p for h in hashes]) for a, b in self.perms]
+
+    @staticmethod
+    def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class SignatureStore:
+    """Persisted MinHash signatures keyed by a digest of the hashed text, so reloading the catalog skips rehashing."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS minhash_signatures (
+                    digest TEXT PRIMARY KEY,
+                    signature TEXT NOT NULL
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def load(self) -> Dict[str, List[int]]:
+        with self._connect() as conn:
+            return {digest: json.loads(sig) for digest, sig in conn.execute("SELECT digest, signature FROM minhash_signatures")}
+
+    def save(self, signatures: Dict[str, List[int]]):
+        if not signatures:
+            return
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO minhash_signatures (digest, signature) VALUES (?, ?)",
+                             [(digest, json.dumps(sig)) for digest, sig in signatures.items()])
+
+
+class DuplicateIndex:
+    """Cross-source near-duplicate detection (title keys + MinHash/LSH over abstracts).
+
+    Lookups touch one dict entry per title key and one bucket per LSH band, so
+    checking a record costs O(bands) instead of a scan of the whole catalog.
+    A title match only counts when an author surname or the abstract agrees.
+    Matching records are merged into one canonical entry carrying every
+    source identifier and the best available PDF.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.7, store: Optional[SignatureStore] = None):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.hasher = MinHasher(num_perm)
+        self.store = store
+        self.known: Dict[str, List[int]] = store.load() if store else {}
+        self.pending: Dict[str, List[int]] = {}
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.records: Dict[str, object] = {}
+        self.signatures: Dict[str, List[int]] = {}
+        self.by_title: Dict[str, List[str]] = {}
+        self.buckets: Dict[tuple, List[str]] = {}
+        self.by_alias: Dict[str, str] = {}
+
+    def _band_keys(self, sig: List[int]):
+        for b in range(self.bands):
+            yield (b, tuple(sig[b * self.rows:(b + 1) * self.rows]))
+
+    def find(self, paper, text: str = None, sig: List[int] = None) -> Optional[str]:
+        """Canonical id of an existing record matching `paper`, if any."""
+        if paper.id in self.by_alias:
+            return self.by_alias[paper.id]
+        for ids in (paper.aliases or {}).values():
+            for alias in ids:
+                if alias in self.by_alias:
+                    return self.by_alias[alias]
+        sig = sig or self._signature(paper, text)
+        key = title_key(paper.title)
+        surnames = author_surnames(paper.authors)
+        for cid in self.by_title.get(key, ()) if key else ():
+            if surnames & author_surnames(self.records[cid].authors) or (
+                    sig is not None and cid in self.signatures and MinHasher.similarity(sig, self.signatures[cid]) >= self.threshold):
+                return cid
+        if sig is None:
+            return None
+        for band_key in self._band_keys(sig):
+            for cid in self.buckets.get(band_key, ()):
+                if MinHasher.similarity(sig, self.signatures[cid]) >= self.threshold:
+                    return cid
+        return None
+
+    def _signature(self, paper, text: str = None) -> Optional[List[int]]:
+        body = text or (paper.summary if paper.summary and paper.summary != PLACEHOLDER_ABSTRACT else "")
+        if not body:
+            return None
+        digest = hashlib.sha1(f"{self.hasher.num_perm}:{body}".encode("utf-8")).hexdigest()
+        if digest not in self.known:
+            self.known[digest] = self.pending[digest] = self.hasher.signature(body)
+        return self.known[digest]
+
+    def flush(self):
+        """Persist signatures computed since the last flush."""
+        if self.store:
+            self.store.save(self.pending)
+        self.pending.clear()
+
+    def add(self, paper, text: str = None):
+        """Insert `paper`, merging into an existing record when it is a near-duplicate. Returns the canonical record."""
+        sig = self._signature(paper, text)
+        cid = self.find(paper, text, sig)
+        if cid is not None:
+            canonical = self.records[cid]
+            merge_papers(canonical, paper)
+            self._register(canonical, sig if cid not in self.signatures else None)
+            return canonical
+        paper.aliases = {src: list(ids) for src, ids in (paper.aliases or {}).items()}
+        _add_alias(paper.aliases, paper.source, paper.id)
+        self.records[paper.id] = paper
+        self._register(paper, sig)
+        return paper
+
+    def _register(self, paper, sig: List[int] = None):
+        cid = paper.id
+        for alias in [cid, *(a for ids in paper.aliases.values() for a in ids)]:
+            self.by_alias[alias] = cid
+        key = title_key(paper.title)
+        if key and cid not in self.by_title.get(key, []):
+            self.by_title.setdefault(key, []).append(cid)
+        if sig is not None and cid not in self.signatures:
+            self.signatures[cid] = sig
+            for band_key in self._band_keys(sig):
+                self.buckets.setdefault(band_key, []).append(cid)
+
+
+def merge_papers(canonical, other):
+    """Fold `other` into `canonical` in place: union identifiers, keep the richest metadata and best PDF."""
+    canonical.aliases = {src: list(ids) for src, ids in (canonical.aliases or {}).items()}
+    _add_alias(canonical.aliases, canonical.source, canonical.id)
+    for source, ids in (other.aliases or {}).items():
+        for alias in ids:
+            _add_alias(canonical.aliases, source, alias)
+    _add_alias(canonical.aliases, other.source, other.id)
+    if len(other.authors or []) > len(canonical.authors or []):
+        canonical.authors = other.authors
+    if other.summary and other.summary != PLACEHOLDER_ABSTRACT and (canonical.summary == PLACEHOLDER_ABSTRACT or len(other.summary) > len(canonical.summary or "")):
+        canonical.summary = other.summary
+    if other.pdf_url and (not canonical.pdf_url or PDF_SOURCE_RANK.get(other.source, 9) < PDF_SOURCE_RANK.get(canonical.pdf_source or canonical.source, 9)):
+        canonical.pdf_url = other.pdf_url
+        canonical.pdf_source = other.source
+    return canonical
@@ -1,10 +1,19 @@
 import os
+import time
+import fcntl
 import arxiv
+import sqlite3
+import hashlib
 import logging
 import requests
 import json
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+import math
+import itertools
+from typing import List, Dict, Iterator, Optional, Tuple
+from dataclasses import dataclass, asdict, field, fields
+
+from tracer import TRACER
+from paper_dedup import DuplicateIndex, SignatureStore
 
 @dataclass
 class ResearchPaper:
@@ -15,13 +24,157 @@ class ResearchPaper:
     url: str
     pdf_url: Optional[str] = None
     source: str = "unknown"
+    # source -> identifiers of every record merged into this one (arXiv ids, DOIs, S2 ids...)
+    aliases: Dict[str, List[str]] = field(default_factory=dict)
+    pdf_source: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ResearchPaper":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+class SearchCache:
+    """Persistent provider response cache (SQLite) with TTL and ETag/Last-Modified validators."""
+
+    def __init__(self, db_path: str, ttl: float = 86400):
+        self.db_path = db_path
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    papers TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    next_state TEXT
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def make_key(source: str, query: str, limit: int, start_date: str = None, end_date: str = None, page: int = 0) -> str:
+        normalized = " ".join(query.lower().split())
+        raw = json.dumps([source, normalized, start_date or "", end_date or "", int(limit), int(page)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT papers, etag, last_modified, fetched_at, next_state FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        papers, etag, last_modified, fetched_at, next_state = row
+        return {
+            "papers": [ResearchPaper.from_dict(p) for p in json.loads(papers)],
+            "next": json.loads(next_state) if next_state else None,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - fetched_at < self.ttl,
+        }
+
+    def put(self, key: str, source: str, papers: List[ResearchPaper], etag: str = None, last_modified: str = None, next_state=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, source, papers, etag, last_modified, fetched_at, next_state) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, source, json.dumps([asdict(p) for p in papers]), etag, last_modified, time.time(),
+                 json.dumps(next_state) if next_state is not None else None))
+
+    def touch(self, key: str):
+        """Mark an entry fresh again after a 304 Not Modified revalidation."""
+        with self._connect() as conn:
+            conn.execute("UPDATE search_cache SET fetched_at = ? WHERE key = ?", (time.time(), key))
 
 class BaseProvider:
+    name = "unknown"
+    # Largest page the provider API accepts (set per provider), and the paging state of the first page
+    PAGE_SIZE_LIMIT = 100
+    FIRST_PAGE = 0
+
+    def __init__(self, cache: Optional[SearchCache] = None, offline: bool = False):
+        self.cache = cache
+        self.offline = offline
+
     def search(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None) -> List[ResearchPaper]:
+        return list(itertools.islice(self.iter_search(query, start_date, end_date, page_size=limit), limit))
+
+    def iter_search(self, query: str, start_date: str = None, end_date: str = None, page_size: int = None) -> Iterator[ResearchPaper]:
+        """Lazily yield results, fetching the next page only when the consumer asks for more."""
+        page_size = max(1, min(page_size or self.PAGE_SIZE_LIMIT, self.PAGE_SIZE_LIMIT))
+        state, page = self.FIRST_PAGE, 0
+        while state is not None:
+            with TRACER.span("research.page", category="research", source=self.name, page=page, page_size=page_size) as span:
+                result = self._cached_page(query, start_date, end_date, page_size, page, state)
+                span.set(results=len(result[0]) if result else 0)
+            if result is None:
+                return
+            papers, state = result
+            yield from papers
+            if len(papers) < page_size:
+                return
+            page += 1
+
+    def _cached_page(self, query: str, start_date: str, end_date: str, page_size: int, page: int, state) -> Optional[Tuple[List[ResearchPaper], object]]:
+        key = SearchCache.make_key(self.name, query, page_size, start_date, end_date, page) if self.cache else None
+        cached = self.cache.get(key) if self.cache else None
+
+        if cached and (cached["fresh"] or self.offline):
+            TRACER.current().set(cache_hit=True)
+            return cached["papers"], cached["next"]
+        if self.offline:
+            logging.warning(f"[Offline] No cached {self.name} results for: {query} (page {page})")
+            return None
+
+        # Conditional revalidation of a stale entry
+        headers = {}
+        if cached:
+            if cached["etag"]: headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]: headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            result = self._fetch_page(query, start_date, end_date, page_size, state, headers)
+        except Exception as e:
+            logging.error(f"{self.name} Search Failed: {e}")
+            if cached:
+                logging.warning(f"Serving stale cached {self.name} results.")
+                return cached["papers"], cached["next"]
+            return None
+
+        if result is None:
+            # 304 Not Modified
+            self.cache.touch(key)
+            TRACER.current().set(cache_hit=True, revalidated=True)
+            return cached["papers"], cached["next"]
+
+        papers, next_state, validators = result
+        if self.cache:
+            self.cache.put(key, self.name, papers, validators.get("ETag"), validators.get("Last-Modified"), next_state)
+        return papers, next_state
+
+    def _fetch_page(self, query: str, start_date: str, end_date: str, page_size: int, state, headers: Dict[str, str]):
+        """Fetch one page. Returns (papers, next page state or None, response headers), or None on 304 Not Modified."""
         raise NotImplementedError
 
+    @staticmethod
+    def _get(url: str, params: Dict, headers: Dict[str, str]):
+        response = requests.get(url, params=params, headers=headers, timeout=10)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response
+
 class ArxivProvider(BaseProvider):
-    def search(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None) -> List[ResearchPaper]:
+    name = "arxiv"
+    PAGE_SIZE_LIMIT = 2000
+
+    def __init__(self, cache: Optional[SearchCache] = None, offline: bool = False):
+        super().__init__(cache, offline)
+        # One client for every page: arxiv.Client spaces its own requests by delay_seconds
+        self.client: Optional[arxiv.Client] = None
+
+    def _fetch_page(self, query: str, start_date: str, end_date: str, page_size: int, state, headers: Dict[str, str]):
+        # The arxiv client exposes no validators; entries are refreshed on TTL expiry only. `state` is the result offset.
         full_query = query
         if start_date or end_date:
             date_start = start_date.replace("-", "") + "0000" if start_date else "000001010000"
@@ -30,12 +183,15 @@ class ArxivProvider(BaseProvider):
 
         search = arxiv.Search(
             query=full_query,
-            max_results=limit,
+            max_results=state + page_size,
             sort_by=arxiv.SortCriterion.SubmittedDate if (start_date or end_date) else arxiv.SortCriterion.Relevance
         )
+        if self.client is None:
+            self.client = arxiv.Client(page_size=page_size)
+        self.client.page_size = page_size
 
         papers = []
-        for res in search.results():
+        for res in self.client.results(search, offset=state):
             papers.append(ResearchPaper(
                 id=res.get_short_id(),
                 title=res.title,
@@ -45,15 +201,21 @@ class ArxivProvider(BaseProvider):
                 pdf_url=res.pdf_url,
                 source="arxiv"
             ))
-        return papers
+        return papers, (state + len(papers) if len(papers) == page_size else None), {}
 
 class SemanticScholarProvider(BaseProvider):
-    def search(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None) -> List[ResearchPaper]:
+    name = "semanticscholar"
+    PAGE_SIZE_LIMIT = 100
+    # Relevance search pages by offset; offset + limit may not exceed 1000
+    MAX_OFFSET = 1000
+
+    def _fetch_page(self, query: str, start_date: str, end_date: str, page_size: int, state, headers: Dict[str, str]):
         # Semantic Scholar API: https://api.semanticscholar.org/graph/v1/paper/search
         url = "https://api.semanticscholar.org/graph/v1/paper/search"
         params = {
             "query": query,
-            "limit": limit,
+            "offset": state,
+            "limit": min(page_size, self.MAX_OFFSET - state),
             "fields": "title,authors,abstract,url,openAccessPdf"
         }
         # Date filtering in Semantic Scholar is via year range, we'll approximate
@@ -62,115 +224,164 @@ class SemanticScholarProvider(BaseProvider):
             year_end = end_date.split("-")[0] if end_date else "2025"
             params["year"] = f"{year_start}-{year_end}"
 
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            papers = []
-            for item in data.get("data", []):
-                authors = [a.get("name") for a in item.get("authors", [])]
-                pdf_url = item.get("openAccessPdf", {}).get("url") if item.get("openAccessPdf") else None
-                papers.append(ResearchPaper(
-                    id=item.get("paperId"),
-                    title=item.get("title"),
-                    authors=authors,
-                    summary=item.get("abstract") or "No abstract available.",
-                    url=item.get("url"),
-                    pdf_url=pdf_url,
-                    source="semanticscholar"
-                ))
-            return papers
-        except Exception as e:
-            logging.error(f"Semantic Scholar Search Failed: {e}")
-            return []
+        response = self._get(url, params, headers)
+        if response is None:
+            return None
+        data = response.json()
+        
+        papers = []
+        for item in data.get("data", []):
+            authors = [a.get("name") for a in item.get("authors", [])]
+            pdf_url = item.get("openAccessPdf", {}).get("url") if item.get("openAccessPdf") else None
+            papers.append(ResearchPaper(
+                id=item.get("paperId"),
+                title=item.get("title"),
+                authors=authors,
+                summary=item.get("abstract") or "No abstract available.",
+                url=item.get("url"),
+                pdf_url=pdf_url,
+                source="semanticscholar"
+            ))
+        next_state = data.get("next")
+        if next_state is not None and next_state >= self.MAX_OFFSET:
+            next_state = None
+        return papers, next_state, response.headers
 
 class CrossrefProvider(BaseProvider):
-    def search(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None) -> List[ResearchPaper]:
+    name = "crossref"
+    # Paging state is (cursor, offset): "*" starts a cursor chain and each page returns the next cursor.
+    # Cursors expire after a few minutes, so a cursor read back from the cache falls back to offset paging.
+    FIRST_PAGE = ("*", 0)
+    PAGE_SIZE_LIMIT = 1000
+    MAX_OFFSET = 10000
+
+    def _fetch_page(self, query: str, start_date: str, end_date: str, page_size: int, state, headers: Dict[str, str]):
         # Crossref API: https://api.crossref.org/works
         url = "https://api.crossref.org/works"
+        cursor, offset = state
         params = {
             "query": query,
-            "rows": limit,
+            "rows": page_size,
             "select": "DOI,title,author,abstract,URL,link"
         }
         # Date filtering in Crossref
+        filters = []
         if start_date:
-            params["filter"] = f"from-pub-date:{start_date}"
+            filters.append(f"from-pub-date:{start_date}")
         if end_date:
-             params["filter"] = params.get("filter", "") + f",until-pub-date:{end_date}"
+            filters.append(f"until-pub-date:{end_date}")
+        if filters:
+            params["filter"] = ",".join(filters)
 
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+        if cursor is not None:
+            try:
+                response = self._get(url, {**params, "cursor": cursor}, headers)
+            except requests.HTTPError as e:
+                if cursor == "*" or offset + page_size > self.MAX_OFFSET:
+                    raise
+                logging.warning(f"crossref cursor rejected ({e}); continuing from offset {offset}.")
+                cursor = None
+        if cursor is None:
+            response = self._get(url, {**params, "offset": offset}, headers)
+        if response is None:
+            return None
+        data = response.json()
+        
+        papers = []
+        for item in data.get("message", {}).get("items", []):
+            title = item.get("title", ["Unknown"])[0]
+            authors = [f"{a.get('given', '')} {a.get('family', '')}".strip() for a in item.get("author", [])]
+            doi = item.get("DOI")
+            pdf_url = None
+            # Attempt to find a PDF link
+            for link in item.get("link", []):
+                if link.get("content-type") == "application/pdf":
+                    pdf_url = link.get("URL")
+                    break
             
-            papers = []
-            for item in data.get("message", {}).get("items", []):
-                title = item.get("title", ["Unknown"])[0]
-                authors = [f"{a.get('given', '')} {a.get('family', '')}".strip() for a in item.get("author", [])]
-                doi = item.get("DOI")
-                pdf_url = None
-                # Attempt to find a PDF link
-                for link in item.get("link", []):
-                    if link.get("content-type") == "application/pdf":
-                        pdf_url = link.get("URL")
-                        break
-                
-                paper = ResearchPaper(
-                    id=doi,
-                    title=title,
-                    authors=authors,
-                    summary=item.get("abstract") or "No abstract available.",
-                    url=item.get("URL"),
-                    pdf_url=pdf_url,
-                    source="crossref"
-                )
-                papers.append(paper)
-            return papers
-        except Exception as e:
-            logging.error(f"Crossref Search Failed: {e}")
-            return []
+            paper = ResearchPaper(
+                id=doi,
+                title=title,
+                authors=authors,
+                summary=item.get("abstract") or "No abstract available.",
+                url=item.get("URL"),
+                pdf_url=pdf_url,
+                source="crossref"
+            )
+            papers.append(paper)
+        items = data.get("message", {}).get("items", [])
+        next_state = None
+        if len(items) == page_size:
+            next_offset = offset + len(items)
+            next_cursor = data.get("message", {}).get("next-cursor") if cursor is not None else None
+            if next_cursor is not None or next_offset + page_size <= self.MAX_OFFSET:
+                next_state = (next_cursor, next_offset)
+        return papers, next_state, response.headers
 
 class ResearchEngine:
-    def __init__(self, download_dir: str = "./papers"):
+    def __init__(self, download_dir: str = "./papers", cache_path: str = None, cache_ttl: float = 86400, offline: bool = False):
         self.download_dir = download_dir
+        self.offline = offline
         os.makedirs(download_dir, exist_ok=True)
+        cache_path = cache_path or os.path.join(download_dir, ".search_cache.sqlite")
+        cache = SearchCache(cache_path, ttl=cache_ttl)
+        # MinHash signatures live beside the search cache so dedup never rehashes the catalog
+        self.signatures = SignatureStore(cache_path)
         self.providers = {
-            "arxiv": ArxivProvider(),
-            "semanticscholar": SemanticScholarProvider(),
-            "crossref": CrossrefProvider()
+            "arxiv": ArxivProvider(cache, offline),
+            "semanticscholar": SemanticScholarProvider(cache, offline),
+            "crossref": CrossrefProvider(cache, offline)
         }
 
-    def search_and_download(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None, fetch_mode: str = "fulltext", auto_confirm: bool = False, sources: List[str] = ["arxiv"]):
-        all_papers = []
-        for src in sources:
-            if src in self.providers:
-                logging.info(f"Searching {src} for: {query}...")
-                all_papers.extend(self.providers[src].search(query, limit, start_date, end_date))
-        
-        # Deduplicate
-        seen_ids = set()
-        unique_papers = []
-        for p in all_papers:
-            if p.id not in seen_ids:
-                unique_papers.append(p)
-                seen_ids.add(p.id)
+    def search_and_download(self, query: str, limit: int = 5, start_date: str = None, end_date: str = None, fetch_mode: str = "fulltext", auto_confirm: bool = False, sources: List[str] = ["arxiv"]) -> List[str]:
+        """Search, deduplicate and download. Returns the catalog ids selected for this query."""
+        with TRACER.span("research.search_and_download", category="research", query=query, limit=limit, fetch_mode=fetch_mode):
+            return self._search_and_download(query, limit, start_date, end_date, fetch_mode, auto_confirm, sources)
 
-        count = len(unique_papers)
-        logging.info(f"Found {count} unique papers across {len(sources)} sources.")
+    def _search_and_download(self, query: str, limit: int, start_date: str, end_date: str, fetch_mode: str, auto_confirm: bool, sources: List[str]) -> List[str]:
+        active = [src for src in sources if src in self.providers]
+        if not active:
+            return []
+        # Split the budget across sources; further pages are only fetched if dedup leaves us short
+        page_size = math.ceil(limit / len(active))
+        streams = []
+        for src in active:
+            logging.info(f"Searching {src} for: {query}...")
+            streams.append(self.providers[src].iter_search(query, start_date, end_date, page_size=page_size))
 
-        if count == 0:
-            return
+        # Deduplicate across sources and against the existing catalog (title keys + MinHash/LSH)
+        with TRACER.span("research.dedup", category="research") as span:
+            index = DuplicateIndex(store=self.signatures)
+            for entry in self._load_catalog():
+                index.add(ResearchPaper.from_dict(entry))
+            seen_ids = set()
+            selected_papers = []
+            candidates = 0
+            for p in self._interleave(streams):
+                candidates += 1
+                canonical = index.add(p)
+                if canonical.id not in seen_ids:
+                    selected_papers.append(canonical)
+                    seen_ids.add(canonical.id)
+                    if len(selected_papers) >= limit:
+                        break
+            index.flush()
+            span.set(candidates=candidates, unique=len(selected_papers))
+        for stream in streams:
+            stream.close()
+
+        count = len(selected_papers)
+        logging.info(f"Selected {count} unique papers from {candidates} results across {len(active)} sources.")
 
-        selected_papers = unique_papers[:limit]
+        if count == 0:
+            return []
         
         if not auto_confirm:
             try:
-                ans = input(f"Proceed to download {len(selected_papers)} papers (from {count} found) in '{fetch_mode}' mode? [y/N]: ").lower()
+                ans = input(f"Proceed to download {count} papers in '{fetch_mode}' mode? [y/N]: ").lower()
                 if ans != 'y':
                     logging.info("Download cancelled by user.")
-                    return
+                    return []
             except EOFError:
                 logging.warning("Non-interactive environment. Proceeding.")
 
@@ -178,6 +389,14 @@ class ResearchEngine:
 
         for paper in selected_papers:
             safe_id = paper.id.replace("/", "_").replace(":", "_") # Safe filename
+            if self.offline and fetch_mode == "fulltext" and paper.pdf_url:
+                path = os.path.join(self.download_dir, f"{safe_id}.pdf")
+                if os.path.exists(path) and os.path.getsize(path) > 0:
+                    TRACER.current().incr("cache_hits")
+                else:
+                    # No network: keep the cached metadata as an abstract
+                    self._save_abstract(paper)
+                continue
             if fetch_mode == "fulltext" and paper.pdf_url:
                 filename = f"{safe_id}.pdf"
                 path = os.path.join(self.download_dir, filename)
@@ -185,28 +404,72 @@ class ResearchEngine:
                 # Auto-Resume Check: File must exist and be valid (non-empty)
                 if os.path.exists(path) and os.path.getsize(path) > 0:
                     logging.info(f"[Resume] Paper {safe_id} already exists (PDF). Skipping.")
+                    TRACER.current().incr("cache_hits")
                     continue
                 
                 logging.info(f"Downloading PDF from {paper.source}: {paper.title}...")
-                try:
-                    # Stream download for memory efficiency
-                    res = requests.get(paper.pdf_url, stream=True, timeout=30)
-                    res.raise_for_status()
-                    with open(path, 'wb') as f:
-                        for chunk in res.iter_content(chunk_size=8192):
-                            if chunk: f.write(chunk)
-                except Exception as e:
-                    logging.error(f"Failed to download PDF for {paper.id}: {e}")
-                    # Fallback to abstract if PDF fails
-                    self._save_abstract(paper)
+                with TRACER.span("research.download", category="research", paper=paper.id, source=paper.source) as span:
+                    try:
+                        # Stream download for memory efficiency
+                        res = requests.get(paper.pdf_url, stream=True, timeout=30)
+                        res.raise_for_status()
+                        size = 0
+                        # Write to a private temp file so concurrent workers sharing the corpus never see partial PDFs
+                        tmp_path = f"{path}.{os.getpid()}.part"
+                        with open(tmp_path, 'wb') as f:
+                            for chunk in res.iter_content(chunk_size=8192):
+                                if chunk:
+                                    f.write(chunk)
+                                    size += len(chunk)
+                        os.replace(tmp_path, path)
+                        span.set(bytes=size)
+                    except Exception as e:
+                        logging.error(f"Failed to download PDF for {paper.id}: {e}")
+                        span.set(error=str(e))
+                        # Fallback to abstract if PDF fails
+                        self._save_abstract(paper)
             else:
                 self._save_abstract(paper)
+        return [paper.id for paper in selected_papers]
+
+    @staticmethod
+    def _interleave(streams: List[Iterator[ResearchPaper]]) -> Iterator[ResearchPaper]:
+        """Round-robin merge so every source contributes before any one is paged deeper."""
+        active = list(streams)
+        while active:
+            for stream in list(active):
+                try:
+                    yield next(stream)
+                except StopIteration:
+                    active.remove(stream)
+
+    def _load_catalog(self) -> List[Dict]:
+        catalog_path = os.path.join(self.download_dir, "research_catalog.json")
+        if os.path.exists(catalog_path):
+            try:
+                with open(catalog_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Existing catalog unreadable, rewriting: {e}")
+        return []
 
     def _save_catalog(self, papers: List[ResearchPaper]):
         catalog_path = os.path.join(self.download_dir, "research_catalog.json")
-        catalog_data = [asdict(p) for p in papers]
-        with open(catalog_path, 'w', encoding='utf-8') as f:
-            json.dump(catalog_data, f, indent=2)
+        # The corpus may be shared by several batch workers: merge under an exclusive lock instead of overwriting
+        with open(catalog_path + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            catalog_data = self._load_catalog()
+            # Existing entries keep their position (citation numbers) but take merged aliases/PDFs
+            position = {entry.get("id"): i for i, entry in enumerate(catalog_data)}
+            for p in papers:
+                if p.id in position:
+                    catalog_data[position[p.id]] = asdict(p)
+                else:
+                    catalog_data.append(asdict(p))
+            tmp_path = f"{catalog_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(catalog_data, f, indent=2)
+            os.replace(tmp_path, catalog_path)
         logging.info(f"Structured catalog saved to: {catalog_path}")
 
     def _save_abstract(self, paper: ResearchPaper):
@@ -217,6 +480,7 @@ class ResearchEngine:
         # Auto-Resume Check: Abstract exists and is non-empty
         if os.path.exists(path) and os.path.getsize(path) > 0:
             logging.info(f"[Resume] Paper {safe_id} already exists (Abstract). Skipping.")
+            TRACER.current().incr("cache_hits")
             return
 
         logging.info(f"Saving Abstract from {paper.source}: {paper.title}...")
@@ -27,11 +27,21 @@ if __name__ == "__main__":
     parser.add_argument("-B", "--between", help="Fetch papers published BETWEEN these dates")
     parser.add_argument("-S", "--sources", help="Comma-separated list of sources")
     parser.add_argument("-F", "--format", choices=["pdf", "html", "epub", "docx", "latex", "json", "md"], help="Final output format")
+    parser.add_argument("--trace", nargs="?", const="./traces", metavar="DIR", help="Record spans for every phase/LLM call and export JSONL + Chrome trace to DIR")
+    parser.add_argument("--offline", action="store_true", help="Serve provider searches only from the local search cache (no network)")
+    parser.add_argument("--batch", metavar="QUEUE_FILE", help="Build every book spec in a JSONL queue file (title, keywords, sources, format)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --batch")
+    parser.add_argument("--queue-db", help="SQLite queue/rate-limit database for --batch")
 
     args = parser.parse_args()
     try:
         cfg = ConfigManager.load(args)
-        Orchestrator(cfg).execute_pipeline()
+        if cfg.get("BATCH_FILE"):
+            from job_queue import run_batch
+            counts = run_batch(cfg)
+            print(f"\n📦 Batch Summary: {counts}")
+        else:
+            Orchestrator(cfg).execute_pipeline()
         print("\n✅ \033[0;32mFactory Pipeline Complete.\033[0m")
     except KeyboardInterrupt:
         print("\n\n⚠️ \033[0;33mPipeline interrupted by user.\033[0m")
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+
+
+class Span:
+    """A single timed unit of work (pipeline phase, LLM call, download...)."""
+    __slots__ = ("tracer", "name", "category", "attrs", "start_us", "duration_us", "tid")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.start_us = 0
+        self.duration_us = 0
+        self.tid = threading.get_ident()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def incr(self, key: str, amount: int = 1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+        return self
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        # Children inherit contextual attributes (e.g. chapter) from their parent span
+        if stack:
+            for key in Tracer.INHERITED_ATTRS:
+                if key in stack[-1].attrs and key not in self.attrs:
+                    self.attrs[key] = stack[-1].attrs[key]
+        stack.append(self)
+        self.start_us = time.perf_counter_ns() // 1000
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_us = time.perf_counter_ns() // 1000 - self.start_us
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.tracer._record(self)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span handed out when tracing is disabled."""
+    __slots__ = ()
+
+    def set(self, **attrs):
+        return self
+
+    def incr(self, key: str, amount: int = 1):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Observability: Structured spans with JSONL / Chrome trace-event export."""
+    INHERITED_ATTRS = ("chapter", "book")
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._epoch_us = time.perf_counter_ns() // 1000
+        self._wall_epoch = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def span(self, name: str, category: str = "pipeline", **attrs):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, category, attrs)
+
+    def current(self):
+        """Innermost open span on this thread (or a no-op span)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        stack = self._stack()
+        return stack[-1] if stack else _NULL_SPAN
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    # --- Export ---
+
+    def _event(self, span: Span) -> Dict:
+        return {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": span.start_us - self._epoch_us,
+            "dur": span.duration_us,
+            "pid": os.getpid(),
+            "tid": span.tid,
+            "args": span.attrs,
+        }
+
+    def write_jsonl(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in self.spans:
+                record = {
+                    "name": span.name,
+                    "category": span.category,
+                    "start": round(self._wall_epoch + (span.start_us - self._epoch_us) / 1e6, 6),
+                    "latency_ms": round(span.duration_us / 1000, 3),
+                    **span.attrs,
+                }
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def write_chrome_trace(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": [self._event(s) for s in self.spans], "displayTimeUnit": "ms"}, f, default=str)
+
+    def export(self, trace_dir: str, prefix: str = "trace") -> Optional[Dict[str, str]]:
+        """Write both export formats into trace_dir. Returns the written paths."""
+        if not self.enabled or not self.spans:
+            return None
+        os.makedirs(trace_dir, exist_ok=True)
+        paths = {
+            "jsonl": os.path.join(trace_dir, f"{prefix}.jsonl"),
+            "chrome": os.path.join(trace_dir, f"{prefix}.trace.json"),
+        }
+        self.write_jsonl(paths["jsonl"])
+        self.write_chrome_trace(paths["chrome"])
+        return paths
+
+    def summary(self) -> List[Dict]:
+        rows: Dict[str, Dict] = {}
+        for span in self.spans:
+            row = rows.setdefault(span.name, {"name": span.name, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "tokens": 0, "cache_hits": 0, "errors": 0})
+            ms = span.duration_us / 1000
+            row["count"] += 1
+            row["total_ms"] += ms
+            row["max_ms"] = max(row["max_ms"], ms)
+            row["tokens"] += span.attrs.get("prompt_tokens", 0) + span.attrs.get("completion_tokens", 0)
+            row["cache_hits"] += int(span.attrs.get("cache_hits", 0)) + (1 if span.attrs.get("cache_hit") else 0)
+            row["errors"] += 1 if "error" in span.attrs else 0
+        return sorted(rows.values(), key=lambda r: r["total_ms"], reverse=True)
+
+    def summary_table(self) -> str:
+        header = f"{'Span':<28} {'Count':>6} {'Total(s)':>10} {'Mean(ms)':>10} {'Max(ms)':>10} {'Tokens':>10} {'Cache':>6} {'Err':>4}"
+        lines = [header, "-" * len(header)]
+        for r in self.summary():
+            lines.append(
+                f"{r['name'][:28]:<28} {r['count']:>6} {r['total_ms'] / 1000:>10.2f} {r['total_ms'] / r['count']:>10.1f} "
+                f"{r['max_ms']:>10.1f} {r['tokens']:>10} {r['cache_hits']:>6} {r['errors']:>4}"
+            )
+        return "\n".join(lines)
+
+
+# Process-wide tracer shared by the orchestrator and the research engine.
+TRACER = Tracer(enabled=False)